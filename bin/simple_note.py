@@ -1,14 +1,29 @@
 #!/usr/bin/python3
 import os
-import copy
+import sys
+import csv
 import sqlite3
 import time
 from datetime import datetime, timedelta
 from calendar import monthrange
 import argparse
+import functools
+import operator
+import itertools
+from collections import defaultdict
 import subprocess
 import json
+# orjson is optional, it serializes rows in C straight to bytes
+try:
+    import orjson
+except ImportError:
+    orjson = None
 import yaml
+# prefer the libyaml backed loader/dumper when available
+try:
+    from yaml import CSafeLoader as YamlLoader, CSafeDumper as YamlDumper
+except ImportError:
+    from yaml import SafeLoader as YamlLoader, SafeDumper as YamlDumper
 import uuid
 import re
 from rich.console import Console
@@ -44,12 +59,27 @@ LOG_TEMP =  {
     'note': ''
 }
 
-TIME_FIELD_KEYS = ['created', 'updated', 'scheduled']
-STR_FIELD_KEYS = ['id', 'task', 'status', 'issue', 'note', 'context', 'application']
-INT_FIELD_KEYS = ['priority']
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+TIME_FIELD_KEYS = frozenset(['created', 'updated', 'scheduled'])
 READ_ONLY_KEYS = ['id', 'created', 'updated']
 EDITABLE_KEYS = ['task', 'priority', 'status', 'issue', 'scheduled', 'note', 'context', 'application']
 
+# column order of the insert statement and a getter packing an entry into its record
+_INSERT_FIELDS = tuple(LOG_TEMP.keys())
+_INSERT_GETTER = operator.itemgetter(*_INSERT_FIELDS)
+
+# filter parsing patterns, compiled once at import
+_RANGE_STRIP_RE = re.compile(r'\s*range\s*=\s*')
+_OFFSET_RE = re.compile(r'(\w+)\s*([+-])\s*(\d+)\s*([smhd]?)')
+_REGEX_STRIP_RE = re.compile(r'\s*~\s*')
+
+# shared rich console for table output, created on first use
+_CONSOLE = None
+
+# reusable json encoder for when orjson is not installed, compact and without
+# escaping non-ascii characters to match the orjson output
+_JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
 
 def str_presenter(dumper, data):
     """configures yaml for dumping multiline strings
@@ -60,6 +90,7 @@ def str_presenter(dumper, data):
 
 yaml.add_representer(str, str_presenter)
 yaml.representer.SafeRepresenter.add_representer(str, str_presenter) # to use with safe_dum
+YamlDumper.add_representer(str, str_presenter)
 
 
 def simple_note():
@@ -71,11 +102,12 @@ def simple_note():
     parser.add_argument('-v', '--verbose', default=2, type=int, help='Verbose level')
     parser.add_argument('-f', '--filter', help='Apply filter query')
     parser.add_argument('-o', '--output', default='table', help='Choose output format')
+    parser.add_argument('--limit', default=200, type=int, help='Maximum number of entries to return, -1 for no limit')
+    parser.add_argument('--offset', default=0, type=int, help='Number of entries to skip')
     args = parser.parse_args()
 
     # if the tmp directory is not present, create it
-    if not os.path.isdir(TMP_DIR):
-        os.mkdir(TMP_DIR)
+    os.makedirs(TMP_DIR, exist_ok=True)
 
     conn = create_connection()
 
@@ -104,16 +136,20 @@ def simple_note():
     if args.list:
         get_log(
             conn,
-            filter=args.filter if 'filter' in args else None,
-            output=args.output if 'output' in args else None,
-            verbose=args.verbose if 'verbose' in args else None,
+            filter=args.filter,
+            output=args.output,
+            verbose=args.verbose,
+            limit=args.limit,
+            offset=args.offset,
             print=True,
         )
 
     if args.edit:
         edit_log(
             conn,
-            filter=args.filter if 'filter' in args else None,
+            filter=args.filter,
+            limit=args.limit,
+            offset=args.offset,
         )
 
     conn.close()
@@ -123,7 +159,14 @@ def create_connection():
     conn = None
     # conn to sqlite3 db
     try:
-      conn = sqlite3.connect(DB_PATH)
+      # autocommit mode, writes manage their own transactions explicitly
+      conn = sqlite3.connect(DB_PATH, isolation_level=None)
+      # WAL journal so a commit is a single append and readers don't block writers,
+      # 64MB page cache and in-memory temp tables
+      conn.execute('PRAGMA journal_mode = WAL')
+      conn.execute('PRAGMA synchronous = NORMAL')
+      conn.execute('PRAGMA temp_store = MEMORY')
+      conn.execute('PRAGMA cache_size = -65536')
       return conn
     except sqlite3.Error as e:
         print(e)
@@ -133,55 +176,35 @@ def create_connection():
 
 
 def check_log_table(conn):
-    sql = """SELECT name FROM sqlite_schema WHERE type='table' AND name='WORKLOG';"""
+    # create the worklog table and its indexes, each is skipped if it already exists
+    sql_create = """
+        CREATE TABLE IF NOT EXISTS WORKLOG(
+            ID NVARCHAR(32) NOT NULL,
+            TASK NVARCHAR(255) NOT NULL,
+            CONTEXT TEXT(500),
+            APPLICATION TEXT(500),
+            PRIORITY TINYINT,
+            STATUS VARCHAR(25),
+            ISSUE VARCHAR(25),
+            CREATED INT NOT NULL,
+            UPDATED INT NOT NULL,
+            SCHEDULED INT,
+            NOTE TEXT(1000)
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_worklog_id ON WORKLOG(ID);
+        CREATE INDEX IF NOT EXISTS idx_worklog_scheduled ON WORKLOG(SCHEDULED);
+        CREATE INDEX IF NOT EXISTS idx_worklog_created ON WORKLOG(CREATED);
+    """
     try:
-        cur = conn.cursor()
-        result = cur.execute(sql).fetchall()
+        conn.executescript(sql_create)
     except sqlite3.Error as e:
-        # this is for backward compatibility
-        if str(e) == 'no such table: sqlite_schema':
-            sql = sql.replace('schema', 'master')
-            result = cur.execute(sql).fetchall()
-        else:
-            print(e)
-            exit(1)
-    finally:
-        if cur:
-            cur.close()
-
-    if not len(result):
-        print('WORKLOG table not found; create table')
-        sql_create = """
-            CREATE TABLE WORKLOG(
-                ID NVARCHAR(32) NOT NULL,
-                TASK NVARCHAR(255) NOT NULL,
-                CONTEXT TEXT(500),
-                APPLICATION TEXT(500),
-                PRIORITY TINYINT,
-                STATUS VARCHAR(25),
-                ISSUE VARCHAR(25),
-                CREATED INT NOT NULL,
-                UPDATED INT NOT NULL,
-                SCHEDULED INT,
-                NOTE TEXT(1000)
-            )
-        """
-        try:
-            cur = conn.cursor()
-            cur.execute(sql_create)
-        except sqlite3.Error as e:
-            print(e)
-            exit(1)
-        finally:
-            if cur:
-                cur.close()
-    else:
-        return
+        print(e)
+        exit(1)
 
 
 def get_log(conn, **kwargs):
     filter = kwargs['filter']
-    filter_parsed = parse_filter(filter)
+    (filter_parsed, filter_params) = parse_filter(filter)
     fields = ['id', 'task', 'context', 'application', 'issue', 'priority', 'status', 'scheduled', 'created', 'updated', 'note']
 
     verbose = kwargs['verbose']
@@ -195,18 +218,34 @@ def get_log(conn, **kwargs):
     else:
         display_fields = fields
 
-    sql_get = f"SELECT {','.join(display_fields)} FROM WORKLOG {filter_parsed}"
+    # newest entries first, paginated in sqlite; a negative limit means no limit.
+    # the standup report reads chronologically so it is sorted oldest first
+    output_format = kwargs.get('output') or 'table'
+    order = 'ASC' if output_format == 'standup' else 'DESC'
+    limit = kwargs.get('limit', -1)
+    # fetch one extra row to tell whether the page was truncated
+    sql_get = f"SELECT {','.join(display_fields)} FROM WORKLOG {filter_parsed} ORDER BY SCHEDULED {order} LIMIT ? OFFSET ?"
+    filter_params = filter_params + (limit + 1 if limit >= 0 else -1, kwargs.get('offset', 0))
 
     try:
-        conn.row_factory = dict_factory
+        conn.row_factory = sqlite3.Row
         cur = conn.cursor()
-        result = cur.execute(sql_get).fetchall()
+        cur.execute(sql_get, filter_params)
 
-        # print the result if specified otherwise return result object
-        if 'print' in kwargs and kwargs['print']:
-            output_format = kwargs['output'] if 'output' in kwargs and kwargs['output'] else 'table'
-            display_log(result, output_format, filter)
+        # print the result if specified otherwise return result object,
+        # rows are streamed from the cursor when printing
+        if kwargs.get('print'):
+            display_log(itertools.islice(cur, limit) if limit >= 0 else cur, output_format, filter)
+            truncated = limit >= 0 and cur.fetchone() is not None
         else:
+            result = cur.fetchall()
+            truncated = limit >= 0 and len(result) > limit
+            result = result[:limit] if truncated else result
+
+        if truncated:
+            print(f'Only the first {limit} entries are shown, use --limit/--offset to see more.', file=sys.stderr)
+
+        if not kwargs.get('print'):
             return result
     except sqlite3.Error as e:
         print(e)
@@ -217,112 +256,144 @@ def get_log(conn, **kwargs):
             cur.close()
 
 
-def dict_factory(cursor, row):
-    d = {}
-    for idx, col in enumerate(cursor.description):
-        d[col[0]] = row[idx]
-    return d
-
-
 def display_log(result, output_format, filter):
-    if not result:
+    # result can be any iterable of rows, peek at the first one for the columns
+    rows = iter(result)
+    first = next(rows, None)
+    if first is None:
         print('no log entry found.')
         return
 
-    elif output_format == 'json':
-        print(json.dumps(result))
+    result = itertools.chain([first], rows)
 
-    elif output_format == 'yaml':
-        print(yaml.dump(result, allow_unicode=True, sort_keys=False))
+    # unknown formats fall back to the table view
+    _EMITTERS.get(output_format, _emit_table)(result, first.keys(), filter)
 
-    elif output_format == 'csv':
-        output = []
-        output.append(','.join(result[0].keys()))
-        for item in result:
-            output.append(','.join([str(i) for i in item.values()]))
-        print('\n'.join(output))
 
-    elif output_format == 'table':
-        table = Table(title=f'Tasks table filtered by {filter}')
+def _emit_json(result, columns, filter):
+    rows = [dict(item) for item in result]
+    if orjson:
+        sys.stdout.flush()
+        sys.stdout.buffer.write(orjson.dumps(rows, option=orjson.OPT_APPEND_NEWLINE))
+        sys.stdout.buffer.flush()
+    else:
+        for chunk in _JSON_ENCODER.iterencode(rows):
+            sys.stdout.write(chunk)
+        sys.stdout.write('\n')
 
-        for col in result[0].keys():
-            table.add_column(col.title())
 
-        for item in result:
-            row = []
-            for key in item:
-                if key.lower() in TIME_FIELD_KEYS:
-                    item[key] = datetime.fromtimestamp(item[key]).strftime('%Y-%m-%d %H:%M:%S')
-                elif key.lower() == 'note' and len(item[key]) >= 10:
-                    item[key] = item[key][0:10] + '...'
-                row.append(str(item[key]))
-            table.add_row(*row)
+def _emit_yaml(result, columns, filter):
+    yaml.dump([dict(item) for item in result], sys.stdout, allow_unicode=True, sort_keys=False, Dumper=YamlDumper)
 
-        console = Console()
-        console.print(table)
 
-    elif output_format == 'vi':
-        editor = os.environ.get('EDITOR', 'vim')
-        log_name = f'{TMP_DIR}/tmp_display_{int(time.time())}'
+def _emit_csv(result, columns, filter):
+    # csv.writer quotes values containing commas or new lines
+    writer = csv.writer(sys.stdout, lineterminator='\n')
+    writer.writerow(columns)
+    writer.writerows(result)
 
-        for idx,item in enumerate(result):
-            for key in item:
-                if key.lower() in TIME_FIELD_KEYS:
-                    item[key] = datetime.fromtimestamp(item[key]).strftime('%Y-%m-%d %H:%M:%S')
 
-        with open(log_name, 'w+') as tmp:
-            template = copy.deepcopy(LOG_TEMP)
-            for item in result:
-                tmp.write(yaml.dump([item], allow_unicode=True, sort_keys=False))
-                tmp.write('\n')
-            tmp.flush()
-            subprocess.call([editor, '-R', tmp.name])
+def _emit_table(result, columns, filter):
+    global _CONSOLE
+    table = Table(title=f'Tasks table filtered by {filter}')
 
-        # the tmp log can be safely removed here
-        try:
-            os.remove(log_name)
-        except Exception as e:
-            print(e)
+    for col in columns:
+        table.add_column(col.title())
 
-    elif output_format == 'standup':
-        entry_by_date = {}
-        for item in result:
-            row = []
-            date_key = None
-            for key in item:
-                if key.lower() == 'scheduled':
-                    s_date = datetime.fromtimestamp(item[key])
-                    date_key = s_date.strftime('%Y-%m-%d %A')
-                elif key.lower() in TIME_FIELD_KEYS:
-                    item[key] = datetime.fromtimestamp(item[key]).strftime('%Y-%m-%d %H:%M:%S')
-                    row.append(str(item[key]))
-                elif key.lower() == 'note' and len(item[key]) >= 10:
-                    item[key] = item[key][0:10] + '...'
-                    row.append(str(item[key]))
-                else:
-                    row.append(str(item[key]))
+    for row in _table_rows(result):
+        table.add_row(*row)
 
-            entry = ' | '.join(row)
+    if _CONSOLE is None:
+        _CONSOLE = Console()
+    _CONSOLE.print(table)
 
-            if date_key:
-                if date_key not in entry_by_date:
-                    entry_by_date[date_key] = [entry]
-                else:
-                    entry_by_date[date_key].append(entry)
-
-        today = datetime.now().strftime("%Y-%m-%d %A")
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d %A")
-        print(f'## {datetime.now().strftime("%Y-%m-%d %A")}:')
-        new_line = '\n' # to get around f-string not allowing back slash
-        space = ' '
-        for key in entry_by_date:
-            if key == yesterday:
-                date_stamp = 'Yesterday'
-            elif key == today:
-                date_stamp = 'Today'
+
+def _table_rows(result):
+    # format rows one at a time as they are pulled from the cursor
+    for item in result:
+        row = []
+        for key in item.keys():
+            value = item[key]
+            lower_key = key.lower()
+            if lower_key in TIME_FIELD_KEYS:
+                value = _format_timestamp(value)
+            elif lower_key == 'note' and len(value) >= 10:
+                value = value[0:10] + '...'
+            row.append(str(value))
+        yield row
+
+
+def _emit_vi(result, columns, filter):
+    editor = os.environ.get('EDITOR', 'vim')
+    log_name = f'{TMP_DIR}/tmp_display_{int(time.time())}'
+
+    # rows are read-only, copy them to dicts to format the timestamps
+    result = [dict(item) for item in result]
+    for idx,item in enumerate(result):
+        for key in item:
+            if key.lower() in TIME_FIELD_KEYS:
+                item[key] = _format_timestamp(item[key])
+
+    with open(log_name, 'w+') as tmp:
+        tmp.write(yaml.dump(result, allow_unicode=True, sort_keys=False, Dumper=YamlDumper))
+        tmp.flush()
+        subprocess.call([editor, '-R', tmp.name])
+
+    # the tmp log can be safely removed here
+    try:
+        os.remove(log_name)
+    except Exception as e:
+        print(e)
+
+
+def _emit_standup(result, columns, filter):
+    entry_by_date = defaultdict(list)
+    for item in result:
+        row = []
+        date_key = None
+        for key in item.keys():
+            value = item[key]
+            lower_key = key.lower()
+            if lower_key == 'scheduled':
+                # unscheduled entries have no day to be reported under
+                date_key = _format_timestamp(value, '%Y-%m-%d %A') or None
+            elif lower_key in TIME_FIELD_KEYS:
+                row.append(_format_timestamp(value))
+            elif lower_key == 'note' and len(value) >= 10:
+                row.append(value[0:10] + '...')
             else:
-                date_stamp = key
-            print(f'{new_line}{space*4}{date_stamp}:{new_line}{space*8}{f"{new_line}{space*8}".join(entry_by_date[key])}')
+                row.append(str(value))
+
+        entry = ' | '.join(row)
+
+        if date_key:
+            entry_by_date[date_key].append(entry)
+
+    now = datetime.now()
+    today = now.strftime("%Y-%m-%d %A")
+    yesterday = (now - timedelta(days=1)).strftime("%Y-%m-%d %A")
+    print(f'## {today}:')
+    new_line = '\n' # to get around f-string not allowing back slash
+    space = ' '
+    for key in entry_by_date:
+        if key == yesterday:
+            date_stamp = 'Yesterday'
+        elif key == today:
+            date_stamp = 'Today'
+        else:
+            date_stamp = key
+        print(f'{new_line}{space*4}{date_stamp}:{new_line}{space*8}{f"{new_line}{space*8}".join(entry_by_date[key])}')
+
+
+# output format handlers for display_log
+_EMITTERS = {
+    'json': _emit_json,
+    'yaml': _emit_yaml,
+    'csv': _emit_csv,
+    'table': _emit_table,
+    'vi': _emit_vi,
+    'standup': _emit_standup,
+}
 
 
 def add_log(conn):
@@ -339,10 +410,11 @@ def add_log(conn):
     )
 
     with open(log_name, 'w+') as tmp:
-        template = copy.deepcopy(LOG_TEMP)
-        [template.pop(k) for k in READ_ONLY_KEYS]
-        template["scheduled"] = start_of_work_hour.strftime('%Y-%m-%d %H:%M:%S')
-        text = yaml.dump([template], allow_unicode=True, sort_keys=False).replace('note: \'\'', 'note: |')
+        template = LOG_TEMP.copy()
+        for k in READ_ONLY_KEYS:
+            template.pop(k, None)
+        template["scheduled"] = start_of_work_hour.strftime(TIME_FORMAT)
+        text = yaml.dump([template], allow_unicode=True, sort_keys=False, Dumper=YamlDumper).replace('note: \'\'', 'note: |')
         tmp.write(text)
         tmp.flush()
         subprocess.call([editor, tmp.name])
@@ -352,39 +424,45 @@ def add_log(conn):
 
     # the tmp log can be safely removed here
     try:
-        new_entries = yaml.safe_load(new_log)
+        new_entries = yaml.load(new_log, Loader=YamlLoader)
         os.remove(log_name)
     except Exception as e:
         print(e)
 
     # new entry must have either task or issue filled
-    new_entries = list(filter(lambda entry: any([entry['task'], entry['issue']]), new_entries))
+    new_entries = [entry for entry in new_entries if entry.get('task') or entry.get('issue')]
 
     # assign unique id and assign timestamp to log entry
+    # all entries of one batch share the same created/updated timestamp
+    now_ts = int(time.time())
+    start_of_work_ts = int(start_of_work_hour.timestamp())
     for entry in new_entries:
-        entry['id'] = str(uuid.uuid4())[:32]
+        entry['id'] = uuid.uuid4().hex
         entry['context'] = entry['context'].rstrip().replace("'", "\'")
         entry['application'] = entry['application'].rstrip().replace("'", "\'")
-        entry['created'] = int(time.time())
-        entry['updated'] = int(time.time())
+        entry['created'] = entry['updated'] = now_ts
         # strip trailing new lines
         entry['note'] = entry['note'].rstrip().replace("'", "\'")
         try:
-            entry['scheduled'] = int(datetime.strptime(entry['scheduled'], '%Y-%m-%d %H:%M:%S').timestamp())
+            entry['scheduled'] = int(_fast_parse(entry['scheduled']).timestamp())
         except Exception as e:
             print(e)
             print(f'Schedule {entry["task"]} to start of today')
-            entry['scheduled'] = int(start_of_work_hour.timestamp())
+            entry['scheduled'] = start_of_work_ts
 
     # insert log entry
-    records = [tuple([item[k] for k in LOG_TEMP.keys()]) for item in new_entries]
+    records = [_INSERT_GETTER(item) for item in new_entries]
     print(f'{len(records)} record(s) added to worklog.')
     try:
         cur = conn.cursor()
-        sql_insert = 'INSERT INTO WORKLOG VALUES(?,?,?,?,?,?,?,?,?,?,?);'
+        sql_insert = f"INSERT INTO WORKLOG({','.join(_INSERT_FIELDS)}) VALUES({','.join('?' * len(_INSERT_FIELDS))});"
+        # insert the whole batch in one transaction, rolled back on error
+        cur.execute('BEGIN IMMEDIATE')
         cur.executemany(sql_insert, records)
-        conn.commit()
+        cur.execute('COMMIT')
     except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
         print(e)
         exit(1)
     finally:
@@ -399,10 +477,9 @@ def delete_log(id, conn):
         exit(1)
 
     cur = conn.cursor()
-    sql_delete = f"DELETE FROM WORKLOG WHERE ID = '{id}'"
+    sql_delete = 'DELETE FROM WORKLOG WHERE ID = ?'
     try:
-        cur.execute(sql_delete)
-        conn.commit()
+        cur.execute(sql_delete, (id,))
         print(f'Successfully deleted log id: {id}')
     except sqlite3.Error as e:
         print(e)
@@ -415,8 +492,8 @@ def delete_log(id, conn):
 def edit_log(conn, **kwargs):
     kwargs['verbose'] = 5
     result = get_log(conn, **kwargs)
-    fields = EDITABLE_KEYS
-    fields.append('id')
+    # editable columns plus the id to match entries back, without touching EDITABLE_KEYS
+    fields = frozenset(EDITABLE_KEYS) | {'id'}
     if not result:
         print('no log entry found.')
         return
@@ -427,20 +504,18 @@ def edit_log(conn, **kwargs):
 
         for idx,item in enumerate(result):
             editable_content = {}
-            for key in item:
-                if key.lower() not in fields:
+            for key in item.keys():
+                lower_key = key.lower()
+                if lower_key not in fields:
                     continue
-                elif key.lower() in TIME_FIELD_KEYS:
-                    editable_content[key] = datetime.fromtimestamp(item[key]).strftime('%Y-%m-%d %H:%M:%S')
+                elif lower_key in TIME_FIELD_KEYS:
+                    editable_content[key] = _format_timestamp(item[key])
                 else:
                     editable_content[key] = item[key]
             edit_entries.append(editable_content)
 
         with open(log_name, 'w+') as tmp:
-            template = copy.deepcopy(LOG_TEMP)
-            for item in edit_entries:
-                tmp.write(yaml.dump([item], allow_unicode=True, sort_keys=False))
-                tmp.write('\n')
+            tmp.write(yaml.dump(edit_entries, allow_unicode=True, sort_keys=False, Dumper=YamlDumper))
             tmp.flush()
             subprocess.call([editor, tmp.name])
 
@@ -449,7 +524,7 @@ def edit_log(conn, **kwargs):
 
         # the tmp log can be safely removed here
         try:
-            update_entries = yaml.safe_load(updated_log)
+            update_entries = yaml.load(updated_log, Loader=YamlLoader)
             os.remove(log_name)
         except Exception as e:
             print(e)
@@ -461,55 +536,116 @@ def edit_log(conn, **kwargs):
                 modified_entries.append(entry)
 
         # updated log with new fields info, update the updated timestamp then update db
+        # all modified entries go through one prepared statement in a single transaction
+        sql_update = f"UPDATE WORKLOG SET UPDATED = ?, {', '.join(f'{k.upper()} = ?' for k in EDITABLE_KEYS)} WHERE ID = ?"
+        now_ts = int(datetime.now().timestamp())
+        records = []
         for entry in modified_entries:
-            update_fields = [f' UPDATED = {int(datetime.now().timestamp())}']
-            for k in EDITABLE_KEYS:
-                if k == 'id':
-                    continue
-                elif k in TIME_FIELD_KEYS:
-                    entry[k.upper()] = int(datetime.strptime(entry[k.upper()], '%Y-%m-%d %H:%M:%S').timestamp())
-                elif k in STR_FIELD_KEYS:
-                    entry[k.upper()] = "'" + entry[k.upper()].replace("'", "\'") + "'"
-                    print(entry[k.upper()])
-
-                update_fields.append(f' {k.upper()} = {entry[k.upper()]}')
-
-            sql_update = 'UPDATE WORKLOG SET ' + ','.join(update_fields) +  f" WHERE ID = '{entry['ID']}'"
-
+            record = [now_ts]
             try:
-                cur = conn.cursor()
-                cur.execute(sql_update)
-                conn.commit()
-                print(f'Updated {entry["ID"]}')
-            except sqlite3.Error as e:
-                #print(f'Failed to update {entry["ID"]}: {entry["TASK"]} with statement {sql_update} \n Error: {e}')
-                print(sql_update)
-                print(e)
-            finally:
-                if cur:
-                    cur.close()
+                for k in EDITABLE_KEYS:
+                    # an empty time field stays NULL
+                    if k in TIME_FIELD_KEYS and entry[k.upper()] in ('', None):
+                        entry[k.upper()] = None
+                    elif k in TIME_FIELD_KEYS:
+                        entry[k.upper()] = int(_fast_parse(entry[k.upper()]).timestamp())
+                    record.append(entry[k.upper()])
+            except (TypeError, ValueError) as e:
+                print(f'Skipped {entry["ID"]}: {e}')
+                continue
+            record.append(entry['ID'])
+            records.append(tuple(record))
+
+        # nothing changed, don't take the write lock
+        if not records:
+            return
+
+        try:
+            cur = conn.cursor()
+            cur.execute('BEGIN IMMEDIATE')
+            cur.executemany(sql_update, records)
+            cur.execute('COMMIT')
+            for record in records:
+                print(f'Updated {record[-1]}')
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            print(e)
+        finally:
+            if cur:
+                cur.close()
 
 
 def parse_filter(filter):
+    # returns the where clause with placeholders and its bound parameters
     statement = 'WHERE '
     sections = filter.split(';')
     filters = []
+    params = []
 
     for section in sections:
-        filter_field = re.search('.*(?=\:)', section).group(0).strip()
-        filter_query = re.search('(?<=\:).*', section).group(0).strip()
+        if not section.strip():
+            continue
+        (filter_field, _, filter_query) = section.partition(':')
+        filter_field = filter_field.strip()
+        filter_query = filter_query.strip()
 
         if filter_field.lower() in LOG_TEMP.keys():
             if 'range' in filter_query:
                 # add timefilter query
                 range = parse_timefilter(filter_query)
-                filters.append(f"{filter_field.upper()}  BETWEEN {range['start']} AND {range['end']}")
+                filters.append(f'{filter_field.upper()} BETWEEN ? AND ?')
+                params.extend([range['start'], range['end']])
             elif '~' in filter_query:
-                filters.append(f'{filter_field.upper()} {parse_regexfilter(filter_query)}')
+                (regex_statement, regex_params) = parse_regexfilter(filter_query)
+                filters.append(f'{filter_field.upper()} {regex_statement}')
+                params.extend(regex_params)
         else:
             print(f'Skipped {filter_field}, not a valid field to apply filter.')
+
+    # never run without a where clause, a mistyped filter must not match every entry
+    if not filters:
+        print(f'No valid filter to apply: {filter}')
+        exit(1)
+
     statement += ' AND '.join(filters)
-    return statement
+    return (statement, tuple(params))
+
+
+@functools.lru_cache(maxsize=8)
+def _timeset(year, month, day):
+    # timestamps of the named day, week and month boundaries for the given date
+    start_of_today = datetime(
+        year = year,
+        month = month,
+        day = day,
+        hour = 0,
+        minute = 0,
+        second = 0,
+    )
+    end_of_today = start_of_today + timedelta(hours=23, minutes=59, seconds=59)
+
+    start_of_this_month = datetime(
+        year = year,
+        month = month,
+        day = 1,
+        hour = 0,
+        minute = 0,
+        second = 0,
+    )
+
+    end_of_this_month = start_of_this_month + timedelta(days=(monthrange(year, month)[1] - 1), hours=23, minutes=59, seconds=59)
+    start_of_this_week = start_of_today - timedelta(days=end_of_today.weekday())
+    end_of_this_week = start_of_this_week + timedelta(days=6, minutes=59, seconds = 59)
+
+    return (
+        ('start_of_today', int(start_of_today.timestamp())),
+        ('end_of_today', int(end_of_today.timestamp())),
+        ('start_of_this_month', int(start_of_this_month.timestamp())),
+        ('end_of_this_month', int(end_of_this_month.timestamp())),
+        ('start_of_this_week', int(start_of_this_week.timestamp())),
+        ('end_of_this_week', int(end_of_this_week.timestamp())),
+    )
 
 
 def parse_timefilter(query, **kwargs):
@@ -520,42 +656,21 @@ def parse_timefilter(query, **kwargs):
         'h': 3600,
         'd': 86400
     }
-    ts = {}
     # allow an overwrite of now for unit tests
     if 'now' in kwargs and isinstance(kwargs['now'], datetime):
-        ts['now'] = kwargs['now']
+        now = kwargs['now']
     else:
-        ts['now'] = datetime.now()
-
-    # populate timeset
-    ts['start_of_today'] = datetime(
-        year = ts['now'].year,
-        month = ts['now'].month,
-        day = ts['now'].day,
-        hour = 0,
-        minute = 0,
-        second = 0,
-    )
-    ts['end_of_today'] = ts['start_of_today'] + timedelta(hours=23, minutes=59, seconds=59)
-
-    ts['start_of_this_month'] = datetime(
-        year = ts['now'].year,
-        month = ts['now'].month,
-        day = 1,
-        hour = 0,
-        minute = 0,
-        second = 0,
-    )
+        now = datetime.now()
 
-    ts['end_of_this_month'] = ts['start_of_this_month'] + timedelta(days=(monthrange(ts['now'].year, ts['now'].month)[1] - 1), hours=23, minutes=59, seconds=59)
-    ts['start_of_this_week'] = ts['start_of_today'] - timedelta(days=ts['end_of_today'].weekday())
-    ts['end_of_this_week'] = ts['start_of_this_week'] + timedelta(days=6, minutes=59, seconds = 59)
+    # populate timeset, the day based entries are cached per date
+    ts = dict(_timeset(now.year, now.month, now.day))
+    ts['now'] = int(now.timestamp())
 
     # default range to from 1970-01-01 to now
-    range = {'stat': 0, 'end': int(ts['now'].timestamp())}
+    range = {'stat': 0, 'end': ts['now']}
 
     # regex match query to get start and end
-    query_content = re.sub('\s*range\s*=\s*', '', query).strip()
+    query_content = _RANGE_STRIP_RE.sub('', query).strip()
 
     query_range = {}
     (start, end) = query_content.split(' to ')
@@ -564,37 +679,30 @@ def parse_timefilter(query, **kwargs):
     for k in query_range.keys():
         # if the key is already in timeset, apply it
         if query_range[k] in ts:
-            query_range[k] = int(ts[query_range[k]].timestamp())
-        elif any([sign in query_range[k] for sign in ['+', '-']]):
-            operands = [
-                re.search('.*(?=[\-,\+])', query_range[k]).group(0).strip(),
-                re.search('(?<=[\-,\+]).*', query_range[k]).group(0).strip()
-            ]
-            operator = re.search('[\-,\+]', query_range[k]).group(0).strip()
-
-            if operands[0] in ts:
-                operands[0] = int(ts[operands[0]].timestamp())
-            elif operands[0].isnumeric():
-                operands[0] = int(ts[operands[0]])
-            else:
-                print(f'invalid time operand: {operands[0]}')
-
-            for i in ins.keys():
-                if i in operands[1]:
-                    try:
-                        operands[1] = eval(operands[1].replace(i, f'* {ins[i]}'))
-                        break
-                    except Exception as e:
-                        print(e)
-                        exit(1)
-            try:
-                query_range[k] = eval(' '.join([str(operands[0]), operator, str(operands[1])]))
-            except Exception as e:
-                print(e)
-                exit(1)
-        else:
+            query_range[k] = ts[query_range[k]]
+            continue
+
+        # otherwise it has to be a base time plus or minus an interval,
+        # the interval unit is optional and defaults to seconds
+        offset = _OFFSET_RE.fullmatch(query_range[k])
+        if not offset:
             print(f'Invalid timefilter range: {query_content}')
             exit(1)
+        (base, sign, amount, unit) = offset.groups()
+
+        if base in ts:
+            base = ts[base]
+        elif base.isnumeric():
+            base = int(base)
+        else:
+            print(f'invalid time operand: {base}')
+            exit(1)
+        amount = int(amount) * ins.get(unit, 1)
+
+        if sign == '+':
+            query_range[k] = base + amount
+        else:
+            query_range[k] = base - amount
 
     if any([not isinstance(query_range[k], int) for k in ['start', 'end']]):
         print(f'Invalid timefilter range: {query_content}')
@@ -603,8 +711,22 @@ def parse_timefilter(query, **kwargs):
     return(query_range)
 
 def parse_regexfilter(query, **kwargs):
-    query_content = re.sub('\s*~\s*', '', query).strip()
-    return f"LIKE '{query_content}'"
+    query_content = _REGEX_STRIP_RE.sub('', query).strip()
+    return ('LIKE ?', (query_content,))
+
+
+def _format_timestamp(value, format=TIME_FORMAT):
+    # NULL timestamps render empty, time.localtime(None) would give the current time
+    if value is None:
+        return ''
+    return time.strftime(format, time.localtime(value))
+
+
+def _fast_parse(s):
+    # parse a fixed width TIME_FORMAT string by slicing, much cheaper than strptime
+    if len(s) != 19 or s[4] != '-' or s[7] != '-' or s[10] != ' ' or s[13] != ':' or s[16] != ':':
+        raise ValueError(f"time data '{s}' does not match format '{TIME_FORMAT}'")
+    return datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]), int(s[11:13]), int(s[14:16]), int(s[17:19]))
 
 
 if __name__ == '__main__':
@@ -618,4 +740,29 @@ def test_parse_timefilter():
    assert parse_timefilter('range=start_of_today - 1d to end_of_this_month + 3m', now=datetime(2022, 4, 7, 12, 30, 00)) == {'start': int(datetime(2022, 4, 6, 0, 0, 0).timestamp()), 'end': int(datetime(2022, 5, 1, 0, 2, 59).timestamp())}
    assert parse_timefilter('range =start_of_today - 1d to end_of_this_month + 3m', now=datetime(2022, 4, 7, 12, 30, 00)) == {'start': int(datetime(2022, 4, 6, 0, 0, 0).timestamp()), 'end': int(datetime(2022, 5, 1, 0, 2, 59).timestamp())}
    assert parse_timefilter('range= start_of_this_week - 300m to start_of_today + 7s', now=datetime(2022, 4, 7, 12, 30, 00)) == {'start': int(datetime(2022, 4, 3, 19, 0, 0).timestamp()), 'end': int(datetime(2022, 4, 7, 0, 0, 7).timestamp())}
-
+   assert parse_timefilter('range= 1649300000 - 2h to 1649300000 + 30', now=datetime(2022, 4, 7, 12, 30, 00)) == {'start': 1649292800, 'end': 1649300030}
+
+
+def test_parse_filter():
+   assert parse_filter('task: ~ %meeting%') == ('WHERE TASK LIKE ?', ('%meeting%',))
+   assert parse_filter('scheduled: range= start_of_today to end_of_today; issue: ~ ABC-%')[0] == 'WHERE SCHEDULED BETWEEN ? AND ? AND ISSUE LIKE ?'
+   for invalid in ['bogus: ~ x', 'taks: ~ %foo%; ', 'task: foo']:
+      try:
+         parse_filter(invalid)
+         assert False, invalid
+      except SystemExit:
+         pass
+   assert parse_filter('task: ~ a:b;') == ('WHERE TASK LIKE ?', ('a:b',))
+
+def test_fast_parse():
+   assert _fast_parse('2022-04-07 12:30:05') == datetime(2022, 4, 7, 12, 30, 5)
+   for invalid in ['2022-4-7 12:30:05', '2022-04-07T12:30:05', '2022-13-07 12:30:05']:
+      try:
+         _fast_parse(invalid)
+         assert False, invalid
+      except ValueError:
+         pass
+
+def test_format_timestamp():
+   assert _format_timestamp(None) == ''
+   assert _format_timestamp(int(datetime(2022, 4, 7, 12, 30, 5).timestamp())) == '2022-04-07 12:30:05'